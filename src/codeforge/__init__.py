@@ -8,10 +8,13 @@ A powerful Python package extracted from MemCore.
 __version__ = "0.1.0"
 __author__ = "MemCore Contributors"
 
-from .core import AutoCoder
+from .core import AutoCoder, CodeGenerator
 from .exceptions import AutoCoderError
+from .utils import get_code_generator
 
 __all__ = [
     "AutoCoder",
     "AutoCoderError",
+    "CodeGenerator",
+    "get_code_generator",
 ]
@@ -1,20 +1,75 @@
-import orjson
 """Core implementation of auto-coder"""
 
 import ast
+import copy
+import hashlib
+import os
 import re
+import shutil
 import subprocess
 import tempfile
+import time
 import asyncio
+import functools
+from collections import OrderedDict, deque
 from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
 from dataclasses import dataclass
 from enum import Enum
 import logging
-import black
-import autopep8
 from ..agents.open_source_solution_finder import get_solution_finder, check_before_coding, RequirementSpec, SolutionLevel
 
+_CODE_BLOCK_RE = re.compile('```(?:\\w+)?\\n(.*?)```', re.DOTALL)
+_IDENT_SANITIZE_RE = re.compile('[^a-zA-Z0-9_]')
+_MARKER_RE = re.compile('here|this|the following|code:|example:', re.IGNORECASE)
+_JS_MARKERS = re.compile('(var )|(console\\.log)|(try|catch)')
+_BLACK_MODE = None
+_DOCSTRING_NODES = (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)
+_SOLUTION_CACHE_TTL = 300.0
+_MAX_MODIFICATION_HISTORY = 1000
+_MAX_CACHE_ENTRIES = 256
+_PROMPT_TAIL = ['\nGenerate clean, efficient, well-documented code.', 'Include error handling and edge cases.', 'Follow best practices and coding standards.']
+_SAFE_PATTERNS = ['osa_*.py', 'src/core/*.py', 'src/plugins/*.py']
+
+
+def _compile_path_patterns(patterns: List[str]) -> 're.Pattern':
+    """Compile relative glob patterns into one regex with Path.match semantics"""
+    alternatives = [re.escape(pattern).replace('\\*', '[^/]*').replace('\\?', '[^/]') for pattern in patterns]
+    return re.compile(f"(?:^|/)(?:{'|'.join(alternatives)})\\Z")
+
+
+_SAFE_PATH_RE = _compile_path_patterns(_SAFE_PATTERNS)
+
+
+def _score_python_metrics(missing_docs: int, has_try: bool, has_return_hint: bool, code_length: int) -> float:
+    """Reduce Python AST metrics to a quality score in [0, 1]"""
+    score = 1.0
+    for _ in range(missing_docs):
+        score -= 0.1
+    if not has_try and code_length > 100:
+        score -= 0.1
+    if not has_return_hint and code_length > 50:
+        score -= 0.05
+    return max(0.0, min(1.0, score))
+
+
+def _format_with_black(code: str) -> str:
+    """Format Python code with black, importing it on first use"""
+    global _BLACK_MODE
+    import black
+    if _BLACK_MODE is None:
+        _BLACK_MODE = black.Mode()
+    return black.format_str(code, mode=_BLACK_MODE)
+
+
+def _format_with_autopep8(code: str) -> str:
+    """Format Python code with autopep8, importing it on first use"""
+    import autopep8
+    return autopep8.fix_code(code)
+
+
+_PYTHON_FORMATTERS = [_format_with_black, _format_with_autopep8]
+
 
 class CodeType(Enum):
     """Types of code generation tasks"""
@@ -72,11 +127,13 @@ class CodeGenerator:
         self.config = config or {}
         self.langchain_engine = langchain_engine
         self.logger = logging.getLogger('MemCore-CodeGen')
-        self.templates = self._initialize_templates()
         self.analyzers = {ProgrammingLanguage.PYTHON: self._analyze_python, ProgrammingLanguage.JAVASCRIPT: self._analyze_javascript}
         self.formatters = {ProgrammingLanguage.PYTHON: self._format_python, ProgrammingLanguage.JAVASCRIPT: self._format_javascript}
-        self.modification_history = []
-        self.code_cache = {}
+        self.modification_history = deque(maxlen=_MAX_MODIFICATION_HISTORY)
+        self._latest_backup: Dict[str, str] = {}
+        self.code_cache: 'OrderedDict[str, float]' = OrderedDict()
+        self._llm_cache: 'OrderedDict[bytes, Tuple[str, Dict[str, Any]]]' = OrderedDict()
+        self._solution_cache: Dict[tuple, Tuple[float, Dict[str, Any]]] = {}
 
     def _initialize_templates(self) -> Dict[str, CodeTemplate]:
         """Initialize code generation templates"""
@@ -86,6 +143,26 @@ class CodeGenerator:
         templates['python_async'] = CodeTemplate(name='python_async', language=ProgrammingLanguage.PYTHON, template='async def {function_name}({parameters}){type_hints}:\n    """\n    {description}\n    \n    Async function for {purpose}\n    """\n    {implementation}\n', variables=['function_name', 'parameters', 'type_hints', 'description', 'purpose', 'implementation'], description='Template for async Python functions')
         return templates
 
+    @functools.cached_property
+    def templates(self) -> Dict[str, CodeTemplate]:
+        """Code generation templates, built on first use"""
+        return self._initialize_templates()
+
+    @functools.cached_property
+    def _template_by_type(self) -> Dict[Tuple[ProgrammingLanguage, CodeType], CodeTemplate]:
+        """Templates indexed by (language, code type), derived from their '<language>_<code type>' names"""
+        index = {}
+        for (name, template) in self.templates.items():
+            prefix = f'{template.language.value}_'
+            if not name.startswith(prefix):
+                continue
+            try:
+                code_type = CodeType(name[len(prefix):])
+            except ValueError:
+                continue
+            index[(template.language, code_type)] = template
+        return index
+
     async def generate_code(self, request: CodeGenerationRequest) -> GeneratedCode:
         """Generate code based on request"""
         self.logger.info(f'Generating {request.code_type.value} in {request.language.value}')
@@ -99,25 +176,38 @@ class CodeGenerator:
             return await self._generate_with_langchain(request)
         return await self._generate_with_templates(request)
 
+    async def _query_llm(self, prompt: str, role: str) -> Tuple[str, Dict[str, Any]]:
+        """Query the LangChain engine, reusing responses for repeated prompts"""
+        key = hashlib.sha1(f'{role}\0{prompt}'.encode()).digest()
+        cached = self._llm_cache.get(key)
+        if cached is None:
+            cached = await self.langchain_engine.query_with_memory(prompt, role)
+            self._llm_cache[key] = cached
+            if len(self._llm_cache) > _MAX_CACHE_ENTRIES:
+                self._llm_cache.popitem(last=False)
+        else:
+            self._llm_cache.move_to_end(key)
+        (response, metadata) = cached
+        return (response, copy.copy(metadata))
+
     async def _generate_with_langchain(self, request: CodeGenerationRequest) -> GeneratedCode:
         """Generate code using LangChain"""
         prompt = self._build_generation_prompt(request)
-        (response, metadata) = await self.langchain_engine.query_with_memory(prompt, 'coding')
+        (response, metadata) = await self._query_llm(prompt, 'coding')
         code = self._extract_code_from_response(response, request.language)
         if request.language in self.formatters:
             code = self.formatters[request.language](code)
-        tests = None
         if request.code_type != CodeType.TEST:
-            tests = await self._generate_tests(code, request)
-        documentation = await self._generate_documentation(code, request)
-        quality_score = await self._analyze_code_quality(code, request.language)
+            tests_task = self._generate_tests(code, request)
+        else:
+            tests_task = asyncio.sleep(0, result=None)
+        (tests, documentation, quality_score) = await asyncio.gather(tests_task, self._generate_documentation(code, request), self._analyze_code_quality(code, request.language))
         return GeneratedCode(code=code, language=request.language, description=request.description, tests=tests, documentation=documentation, quality_score=quality_score)
 
     async def _generate_with_templates(self, request: CodeGenerationRequest) -> GeneratedCode:
         """Generate code using templates (fallback)"""
-        template_key = f'{request.language.value}_{request.code_type.value}'
-        if template_key in self.templates:
-            template = self.templates[template_key]
+        template = self._template_by_type.get((request.language, request.code_type))
+        if template is not None:
             code = template.template.format(**self._get_template_variables(request, template))
             return GeneratedCode(code=code, language=request.language, description=request.description)
         return GeneratedCode(code=f'# TODO: Implement {request.description}', language=request.language, description=request.description)
@@ -125,30 +215,22 @@ class CodeGenerator:
     def _build_generation_prompt(self, request: CodeGenerationRequest) -> str:
         """Build prompt for code generation"""
         prompt_parts = [f'Generate {request.code_type.value} code in {request.language.value}.', f'Description: {request.description}', '\nRequirements:']
-        for req in request.requirements:
-            prompt_parts.append(f'- {req}')
+        prompt_parts += [f'- {req}' for req in request.requirements]
         if request.constraints:
             prompt_parts.append('\nConstraints:')
-            for constraint in request.constraints:
-                prompt_parts.append(f'- {constraint}')
+            prompt_parts += [f'- {constraint}' for constraint in request.constraints]
         if request.examples:
             prompt_parts.append('\nExamples for reference:')
-            for example in request.examples:
-                prompt_parts.append(f'```\n{example}\n```')
-        prompt_parts.extend(['\nGenerate clean, efficient, well-documented code.', 'Include error handling and edge cases.', 'Follow best practices and coding standards.', f'Output the code in {request.language.value} format.'])
-        return '\n'.join(prompt_parts)
+            prompt_parts += [f'```\n{example}\n```' for example in request.examples]
+        return '\n'.join(prompt_parts + _PROMPT_TAIL + [f'Output the code in {request.language.value} format.'])
 
     def _extract_code_from_response(self, response: str, language: ProgrammingLanguage) -> str:
         """Extract code from LLM response"""
-        code_pattern = '```(?:\\w+)?\\n(.*?)```'
-        matches = re.findall(code_pattern, response, re.DOTALL)
-        if matches:
-            return matches[0].strip()
+        match = _CODE_BLOCK_RE.search(response)
+        if match:
+            return match.group(1).strip()
         lines = response.split('\n')
-        code_lines = []
-        for line in lines:
-            if not any((marker in line.lower() for marker in ['here', 'this', 'the following', 'code:', 'example:'])):
-                code_lines.append(line)
+        code_lines = [line for line in lines if not _MARKER_RE.search(line)]
         return '\n'.join(code_lines).strip()
 
     async def _generate_tests(self, code: str, request: CodeGenerationRequest) -> Optional[str]:
@@ -156,7 +238,7 @@ class CodeGenerator:
         if not self.langchain_engine:
             return None
         test_prompt = f'Generate comprehensive tests for the following {request.language.value} code:\n\n```{request.language.value}\n{code}\n```\n\nGenerate unit tests that:\n- Test normal cases\n- Test edge cases\n- Test error conditions\n- Achieve high code coverage\n- Follow testing best practices for {request.language.value}\n'
-        (response, _) = await self.langchain_engine.query_with_memory(test_prompt, 'coding')
+        (response, _) = await self._query_llm(test_prompt, 'coding')
         return self._extract_code_from_response(response, request.language)
 
     async def _generate_documentation(self, code: str, request: CodeGenerationRequest) -> str:
@@ -164,7 +246,7 @@ class CodeGenerator:
         if not self.langchain_engine:
             return '# Documentation pending'
         doc_prompt = f'Generate comprehensive documentation for the following {request.language.value} code:\n\n```{request.language.value}\n{code}\n```\n\nInclude:\n- Overview and purpose\n- Usage examples\n- Parameter descriptions\n- Return value documentation\n- Potential errors/exceptions\n- Performance considerations\n'
-        (response, _) = await self.langchain_engine.query_with_memory(doc_prompt, 'documentation')
+        (response, _) = await self._query_llm(doc_prompt, 'documentation')
         return response
 
     async def _analyze_code_quality(self, code: str, language: ProgrammingLanguage) -> float:
@@ -175,43 +257,58 @@ class CodeGenerator:
 
     def _analyze_python(self, code: str) -> float:
         """Analyze Python code quality"""
-        score = 1.0
+        if code in self.code_cache:
+            self.code_cache.move_to_end(code)
+            return self.code_cache[code]
         try:
             tree = ast.parse(code)
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)):
+            has_try = False
+            missing_docs = 0
+            stack = [tree]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, _DOCSTRING_NODES):
                     if not ast.get_docstring(node):
-                        score -= 0.1
-            has_try = any((isinstance(node, ast.Try) for node in ast.walk(tree)))
-            if not has_try and len(code) > 100:
-                score -= 0.1
-            if '->' not in code and len(code) > 50:
-                score -= 0.05
+                        missing_docs += 1
+                elif isinstance(node, ast.Try):
+                    has_try = True
+                stack.extend(ast.iter_child_nodes(node))
+            score = _score_python_metrics(missing_docs, has_try, '->' in code, len(code))
         except SyntaxError:
             score = 0.0
-        return max(0.0, min(1.0, score))
+        self.code_cache[code] = score
+        if len(self.code_cache) > _MAX_CACHE_ENTRIES:
+            self.code_cache.popitem(last=False)
+        return score
 
     def _analyze_javascript(self, code: str) -> float:
         """Analyze JavaScript code quality"""
+        found = [False, False, False]
+        for match in _JS_MARKERS.finditer(code):
+            found[match.lastindex - 1] = True
+            if all(found):
+                break
+        (has_var, has_log, has_error_handling) = found
         score = 1.0
-        if 'var ' in code:
+        if has_var:
             score -= 0.1
-        if 'console.log' in code:
+        if has_log:
             score -= 0.05
-        if not any((marker in code for marker in ['try', 'catch', '.catch'])):
+        if not has_error_handling:
             score -= 0.1
         return max(0.0, min(1.0, score))
 
     def _format_python(self, code: str) -> str:
-        """Format Python code"""
-        try:
-            formatted = black.format_str(code, mode=black.Mode())
-            return formatted
-        except:
+        """Format Python code; backends that fail to import are dropped from the module-wide list shared by all instances"""
+        for formatter in list(_PYTHON_FORMATTERS):
             try:
-                return autopep8.fix_code(code)
-            except:
-                return code
+                return formatter(code)
+            except ImportError:
+                # Failed imports are not cached by Python, so drop the backend rather than retry it
+                _PYTHON_FORMATTERS[:] = [f for f in _PYTHON_FORMATTERS if f is not formatter]
+            except Exception:
+                continue
+        return code
 
     def _format_javascript(self, code: str) -> str:
         """Format JavaScript code"""
@@ -219,14 +316,11 @@ class CodeGenerator:
 
     def _get_template_variables(self, request: CodeGenerationRequest, template: CodeTemplate) -> Dict[str, str]:
         """Get variables for template filling"""
-        variables = {}
-        for var in template.variables:
-            if var == 'description':
-                variables[var] = request.description
-            elif var == 'function_name':
-                variables[var] = re.sub('[^a-zA-Z0-9_]', '_', request.description.lower().replace(' ', '_'))[:30]
-            else:
-                variables[var] = f'# TODO: {var}'
+        variables = {var: f'# TODO: {var}' for var in template.variables}
+        if 'description' in variables:
+            variables['description'] = request.description
+        if 'function_name' in variables:
+            variables['function_name'] = _IDENT_SANITIZE_RE.sub('_', request.description.lower().replace(' ', '_'))[:30]
         return variables
 
     async def self_modify(self, target_file: str, modification_request: str) -> bool:
@@ -249,20 +343,30 @@ class CodeGenerator:
             self.logger.error('Modification validation failed')
             return False
         backup_path = target_path.with_suffix('.bak')
-        backup_path.write_text(original_code)
-        target_path.write_text(modified_code)
-        self.modification_history.append({'file': target_file, 'request': modification_request, 'timestamp': asyncio.get_event_loop().time(), 'backup': str(backup_path)})
+        tmp_file = tempfile.NamedTemporaryFile('w', dir=target_path.parent, delete=False)
+        try:
+            with tmp_file:
+                tmp_file.write(modified_code)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            shutil.copymode(target_path, tmp_file.name)
+            backup_path.unlink(missing_ok=True)
+            try:
+                os.link(target_path, backup_path)
+            except OSError:
+                shutil.copy2(target_path, backup_path)
+            os.replace(tmp_file.name, target_path)
+        except BaseException:
+            os.unlink(tmp_file.name)
+            raise
+        self.modification_history.append({'file': target_file, 'request': modification_request, 'timestamp': time.monotonic(), 'backup': str(backup_path)})
+        self._latest_backup[target_file] = str(backup_path)
         self.logger.info(f'Successfully self-modified {target_file}')
         return True
 
     def _is_safe_to_modify(self, target_file: str) -> bool:
         """Check if file is safe to modify"""
-        safe_patterns = ['osa_*.py', 'src/core/*.py', 'src/plugins/*.py']
-        target_path = Path(target_file)
-        for pattern in safe_patterns:
-            if target_path.match(pattern):
-                return True
-        return False
+        return _SAFE_PATH_RE.search(Path(target_file).as_posix()) is not None
 
     async def _generate_modification(self, original_code: str, request: str) -> str:
         """Generate code modification"""
@@ -287,7 +391,7 @@ class CodeGenerator:
         if not self.langchain_engine:
             return code
         optimize_prompt = f'Optimize the following {language.value} code for:\n- Performance\n- Memory usage  \n- Readability\n- Best practices\n\nCode:\n```{language.value}\n{code}\n```\n\nGenerate optimized version:\n'
-        (response, _) = await self.langchain_engine.query_with_memory(optimize_prompt, 'coding')
+        (response, _) = await self._query_llm(optimize_prompt, 'coding')
         optimized = self._extract_code_from_response(response, language)
         if language in self.formatters:
             optimized = self.formatters[language](optimized)
@@ -299,12 +403,12 @@ class CodeGenerator:
             return code
         goals_str = '\n'.join((f'- {goal}' for goal in refactor_goals))
         refactor_prompt = f'Refactor the following {language.value} code to achieve these goals:\n{goals_str}\n\nCode:\n```{language.value}\n{code}\n```\n\nGenerate refactored version:\n'
-        (response, _) = await self.langchain_engine.query_with_memory(refactor_prompt, 'coding')
+        (response, _) = await self._query_llm(refactor_prompt, 'coding')
         return self._extract_code_from_response(response, language)
 
     def get_modification_history(self) -> List[Dict[str, Any]]:
         """Get history of self-modifications"""
-        return self.modification_history.copy()
+        return list(self.modification_history)
 
     async def _check_for_existing_solution(self, request: CodeGenerationRequest) -> Dict[str, Any]:
         """Check if there's an open source solution before writing custom code"""
@@ -312,7 +416,22 @@ class CodeGenerator:
             return {'should_use_library': False}
         level_map = {CodeType.FUNCTION: SolutionLevel.FUNCTION, CodeType.CLASS: SolutionLevel.MODULE, CodeType.MODULE: SolutionLevel.PACKAGE, CodeType.SCRIPT: SolutionLevel.PACKAGE}
         level = level_map.get(request.code_type, SolutionLevel.FUNCTION)
+        key = (request.description, level, tuple(request.requirements), tuple(request.constraints))
+        cached = self._solution_cache.get(key)
+        if cached is not None:
+            if time.monotonic() - cached[0] < _SOLUTION_CACHE_TTL:
+                return cached[1]
+            del self._solution_cache[key]
         result = await check_before_coding(description=request.description, level=level, features=request.requirements, constraints=request.constraints)
+        now = time.monotonic()
+        # Entries are kept in insertion (and therefore timestamp) order, so expired ones sit at the front
+        while self._solution_cache:
+            oldest = next(iter(self._solution_cache))
+            if now - self._solution_cache[oldest][0] < _SOLUTION_CACHE_TTL:
+                break
+            del self._solution_cache[oldest]
+        self._solution_cache.pop(key, None)
+        self._solution_cache[key] = (now, result)
         return result
 
     async def _generate_library_usage_code(self, request: CodeGenerationRequest, solution_check: Dict[str, Any]) -> GeneratedCode:
@@ -323,7 +442,7 @@ class CodeGenerator:
         library_code = f"\n# Using {best_solution.name} library instead of custom implementation\n# {best_solution.description}\n# Installation: {best_solution.installation}\n\n{solution_check.get('code_example', '')}\n\n# Implementation using {best_solution.name}:\n"
         if self.langchain_engine:
             prompt = f"Generate {request.language.value} code that uses the '{best_solution.name}' library\nto implement: {request.description}\n\nThe library provides: {best_solution.description}\nInstallation: {best_solution.installation}\n\nGenerate clean, production-ready code that properly uses this library:\n"
-            (response, _) = await self.langchain_engine.query_with_memory(prompt, 'coding')
+            (response, _) = await self._query_llm(prompt, 'coding')
             implementation = self._extract_code_from_response(response, request.language)
             library_code += implementation
         else:
@@ -335,13 +454,16 @@ class CodeGenerator:
 
     def rollback_modification(self, file_path: str) -> bool:
         """Rollback a self-modification"""
-        for mod in reversed(self.modification_history):
-            if mod['file'] == file_path:
-                backup_path = Path(mod['backup'])
-                if backup_path.exists():
-                    target_path = Path(file_path)
-                    target_path.write_text(backup_path.read_text())
-                    self.logger.info(f'Rolled back {file_path} from {backup_path}')
-                    return True
+        backup = self._latest_backup.get(file_path)
+        if backup:
+            backup_path = Path(backup)
+            if backup_path.exists():
+                target_path = Path(file_path)
+                target_path.write_text(backup_path.read_text())
+                self.logger.info(f'Rolled back {file_path} from {backup_path}')
+                return True
         self.logger.error(f'No backup found for {file_path}')
-        return False
\ No newline at end of file
+        return False
+
+
+AutoCoder = CodeGenerator
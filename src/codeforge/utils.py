@@ -1,11 +1,19 @@
 """Utility functions for auto-coder"""
 
+import threading
 from typing import Dict, Any, Optional, List, Tuple
 
+from .core import CodeGenerator
+
+_code_generator: Optional[CodeGenerator] = None
+_code_generator_lock = threading.Lock()
+
 
 def get_code_generator(langchain_engine=None, config: Dict[str, Any]=None) -> CodeGenerator:
     """Get or create the global code generator"""
     global _code_generator
     if _code_generator is None:
-        _code_generator = CodeGenerator(langchain_engine, config)
-    return _code_generator
\ No newline at end of file
+        with _code_generator_lock:
+            if _code_generator is None:
+                _code_generator = CodeGenerator(langchain_engine, config)
+    return _code_generator
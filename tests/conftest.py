@@ -0,0 +1,49 @@
+"""Shared fixtures for codeforge tests"""
+
+import importlib
+import sys
+import types
+from enum import Enum
+from pathlib import Path
+
+import pytest
+
+# core.py imports the open source solution finder from its host package (``..agents``),
+# which is not part of this repository. Mount src/ under a stub host package providing it.
+_HOST = '_codeforge_host'
+
+
+class SolutionLevel(Enum):
+    """Stand-in for the solution finder's SolutionLevel"""
+    FUNCTION = 'function'
+    MODULE = 'module'
+    PACKAGE = 'package'
+
+
+async def check_before_coding(description, level, features, constraints):
+    """Stand-in for the solution finder lookup"""
+    return {'should_use_library': False}
+
+
+def _install_host_package():
+    host = types.ModuleType(_HOST)
+    host.__path__ = [str(Path(__file__).resolve().parents[1] / 'src')]
+    agents = types.ModuleType(f'{_HOST}.agents')
+    agents.__path__ = []
+    finder = types.ModuleType(f'{_HOST}.agents.open_source_solution_finder')
+    finder.get_solution_finder = lambda *args, **kwargs: None
+    finder.check_before_coding = check_before_coding
+    finder.RequirementSpec = object
+    finder.SolutionLevel = SolutionLevel
+    sys.modules.setdefault(_HOST, host)
+    sys.modules.setdefault(agents.__name__, agents)
+    sys.modules.setdefault(finder.__name__, finder)
+
+
+_install_host_package()
+
+
+@pytest.fixture
+def core():
+    """The codeforge.core module"""
+    return importlib.import_module(f'{_HOST}.codeforge.core')
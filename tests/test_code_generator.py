@@ -0,0 +1,289 @@
+"""Tests for CodeGenerator"""
+
+import asyncio
+import types
+from pathlib import Path
+
+import pytest
+
+ORIGINAL_CODE = 'def answer():\n    return 41\n'
+MODIFIED_CODE = 'def answer():\n    return 42\n'
+
+
+class FakeEngine:
+    """LangChain engine stub that always answers with MODIFIED_CODE"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def query_with_memory(self, prompt, role):
+        self.calls.append((prompt, role))
+        return (f'```python\n{MODIFIED_CODE}```', {'role': role})
+
+
+@pytest.fixture
+def target(tmp_path):
+    """A source file that is safe to self-modify"""
+    path = tmp_path / 'src' / 'core' / 'osa_answer.py'
+    path.parent.mkdir(parents=True)
+    path.write_text(ORIGINAL_CODE)
+    return path
+
+
+@pytest.fixture
+def generator(core):
+    """CodeGenerator wired to the fake engine"""
+    return core.CodeGenerator(FakeEngine())
+
+
+class TestSelfModification:
+    """Test cases for self_modify and rollback_modification"""
+
+    def test_writes_modification_and_backup(self, generator, target):
+        """The target gets the new code and the .bak keeps the original"""
+        assert asyncio.run(generator.self_modify(str(target), 'return 42'))
+        assert target.read_text() == MODIFIED_CODE.strip()
+        assert target.with_suffix('.bak').read_text() == ORIGINAL_CODE
+        assert sorted(p.name for p in target.parent.iterdir()) == ['osa_answer.bak', 'osa_answer.py']
+        assert generator.get_modification_history()[-1]['backup'] == str(target.with_suffix('.bak'))
+
+    def test_backup_falls_back_to_copy(self, core, generator, target, monkeypatch):
+        """A filesystem without hard links still gets a backup"""
+        def no_link(src, dst):
+            raise OSError('hard links not supported')
+        monkeypatch.setattr(core.os, 'link', no_link)
+        assert asyncio.run(generator.self_modify(str(target), 'return 42'))
+        assert target.with_suffix('.bak').read_text() == ORIGINAL_CODE
+
+    def test_failed_replace_leaves_target_and_no_temp_file(self, core, generator, target, monkeypatch):
+        """A failing rename keeps the original and removes the temp file"""
+        def failing_replace(src, dst):
+            raise OSError('disk full')
+        monkeypatch.setattr(core.os, 'replace', failing_replace)
+        with pytest.raises(OSError):
+            asyncio.run(generator.self_modify(str(target), 'return 42'))
+        monkeypatch.undo()
+        assert target.read_text() == ORIGINAL_CODE
+        assert {p.name for p in target.parent.iterdir()} <= {'osa_answer.bak', 'osa_answer.py'}
+        assert generator.get_modification_history() == []
+
+    def test_rollback_restores_backup(self, generator, target):
+        """Rollback puts the original code back"""
+        asyncio.run(generator.self_modify(str(target), 'return 42'))
+        assert generator.rollback_modification(str(target))
+        assert target.read_text() == ORIGINAL_CODE
+
+    def test_rollback_without_backup(self, generator, target):
+        """Rollback of an unmodified file reports failure"""
+        assert not generator.rollback_modification(str(target))
+        assert target.read_text() == ORIGINAL_CODE
+
+
+class TestSolutionCache:
+    """Test cases for the open source solution check cache"""
+
+    @pytest.fixture
+    def clock(self, core, monkeypatch):
+        clock = types.SimpleNamespace(now=0.0)
+        monkeypatch.setattr(core, 'time', types.SimpleNamespace(monotonic=lambda: clock.now))
+        monkeypatch.setattr(core, 'SOLUTION_FINDER_AVAILABLE', True, raising=False)
+        return clock
+
+    @pytest.fixture
+    def lookups(self, core, clock, monkeypatch):
+        """Descriptions passed to check_before_coding; each lookup takes 10 s"""
+        lookups = []
+
+        async def check_before_coding(description, level, features, constraints):
+            lookups.append(description)
+            clock.now += 10.0
+            return {'should_use_library': False, 'description': description}
+        monkeypatch.setattr(core, 'check_before_coding', check_before_coding)
+        return lookups
+
+    @staticmethod
+    def _request(core, description):
+        return core.CodeGenerationRequest(description=description, code_type=core.CodeType.FUNCTION, language=core.ProgrammingLanguage.PYTHON, requirements=['fast'], constraints=[])
+
+    def test_hit_within_ttl_and_requery_after(self, core, clock, lookups):
+        """Results are reused for 300 s counted from when the lookup finished"""
+        generator = core.CodeGenerator()
+        request = self._request(core, 'parse dates')
+        asyncio.run(generator._check_for_existing_solution(request))
+        clock.now = 10.0 + 299.0
+        result = asyncio.run(generator._check_for_existing_solution(request))
+        assert result['description'] == 'parse dates'
+        assert lookups == ['parse dates']
+        clock.now = 10.0 + 301.0
+        asyncio.run(generator._check_for_existing_solution(request))
+        assert lookups == ['parse dates', 'parse dates']
+
+    def test_expired_entries_are_evicted(self, core, clock, lookups):
+        """Inserting a result drops entries that have expired"""
+        generator = core.CodeGenerator()
+        asyncio.run(generator._check_for_existing_solution(self._request(core, 'parse dates')))
+        clock.now = 1000.0
+        asyncio.run(generator._check_for_existing_solution(self._request(core, 'send email')))
+        assert [key[0] for key in generator._solution_cache] == ['send email']
+
+
+SAFE_PATH_CASES = [
+    'osa_main.py',
+    'osa_.py',
+    'pkg/osa_main.py',
+    '/abs/pkg/osa_main.py',
+    'myosa_main.py',
+    'osa_dir/main.py',
+    'osa_main.pyc',
+    'src/core/engine.py',
+    './src/core/engine.py',
+    '/abs/src/core/engine.py',
+    '/src/core/engine.py',
+    'src/core/sub/engine.py',
+    'xsrc/core/engine.py',
+    'src/plugins/plugin.py',
+    'src/plugins/plugin.txt',
+    'lib/src/plugins/plugin.py',
+    'src/other/engine.py',
+    'engine.py',
+    'osa_main.py\n',
+    'src/plugins/plugin.py\n',
+]
+
+
+@pytest.mark.parametrize('path', SAFE_PATH_CASES)
+def test_is_safe_to_modify_matches_path_match(core, path):
+    """The precompiled regex agrees with Path.match on the safe patterns"""
+    expected = any(Path(path).match(pattern) for pattern in core._SAFE_PATTERNS)
+    assert core.CodeGenerator()._is_safe_to_modify(path) == expected
+
+
+@pytest.mark.parametrize('count, expected', [(3, 0.65), (4, 0.55), (5, 0.4500000000000001)])
+def test_python_quality_score_matches_per_definition_penalty(core, count, expected):
+    """Undocumented definitions are penalised one at a time, as before the scoring was extracted"""
+    code = ''.join(f'def f{i}():\n    pass\n' for i in range(count))
+    assert core.CodeGenerator()._analyze_python(code) == expected
+
+
+class TestTemplates:
+    """Test cases for template lookup"""
+
+    @staticmethod
+    def _request(core, code_type):
+        return core.CodeGenerationRequest(description='load config', code_type=code_type, language=core.ProgrammingLanguage.PYTHON, requirements=[], constraints=[])
+
+    def test_index_covers_templates_named_after_code_types(self, core):
+        """Only templates named '<language>_<code type>' are indexed"""
+        generator = core.CodeGenerator()
+        assert set(generator._template_by_type) == {(core.ProgrammingLanguage.PYTHON, core.CodeType.FUNCTION), (core.ProgrammingLanguage.PYTHON, core.CodeType.CLASS)}
+
+    def test_added_template_is_used(self, core):
+        """A newly registered template is found without touching the index"""
+        generator = core.CodeGenerator()
+        generator.templates['python_module'] = core.CodeTemplate(name='python_module', language=core.ProgrammingLanguage.PYTHON, template='"""{description}"""\n', variables=['description'], description='Template for Python modules')
+        result = asyncio.run(generator._generate_with_templates(self._request(core, core.CodeType.MODULE)))
+        assert result.code == '"""load config"""\n'
+
+
+class TestLLMCache:
+    """Test cases for the LLM response cache"""
+
+    def test_repeated_prompt_queries_engine_once(self, generator):
+        """The second identical query is served from the cache"""
+        first = asyncio.run(generator._query_llm('write a parser', 'coding'))
+        second = asyncio.run(generator._query_llm('write a parser', 'coding'))
+        assert first == second
+        assert generator.langchain_engine.calls == [('write a parser', 'coding')]
+
+    def test_role_is_part_of_the_key(self, generator):
+        """The same prompt under another role is a miss"""
+        asyncio.run(generator._query_llm('write a parser', 'coding'))
+        asyncio.run(generator._query_llm('write a parser', 'documentation'))
+        assert len(generator.langchain_engine.calls) == 2
+
+    def test_least_recently_used_entry_is_evicted(self, core, generator, monkeypatch):
+        """Over the limit, the entry used longest ago is dropped"""
+        monkeypatch.setattr(core, '_MAX_CACHE_ENTRIES', 2)
+        for prompt in ('a', 'b', 'a', 'c'):
+            asyncio.run(generator._query_llm(prompt, 'coding'))
+        assert len(generator._llm_cache) == 2
+        asyncio.run(generator._query_llm('a', 'coding'))
+        asyncio.run(generator._query_llm('b', 'coding'))
+        assert [prompt for (prompt, _) in generator.langchain_engine.calls] == ['a', 'b', 'c', 'b']
+
+    def test_returned_metadata_is_a_copy(self, generator):
+        """Mutating metadata from one call does not leak into later hits"""
+        (_, metadata) = asyncio.run(generator._query_llm('write a parser', 'coding'))
+        metadata['role'] = 'tampered'
+        (_, metadata) = asyncio.run(generator._query_llm('write a parser', 'coding'))
+        assert metadata == {'role': 'coding'}
+
+
+class TestQualityCache:
+    """Test cases for the Python quality score cache"""
+
+    @pytest.fixture
+    def parses(self, core, monkeypatch):
+        """Sources passed to ast.parse"""
+        parses = []
+        parse = core.ast.parse
+
+        def counting_parse(source, *args, **kwargs):
+            parses.append(source)
+            return parse(source, *args, **kwargs)
+        monkeypatch.setattr(core.ast, 'parse', counting_parse)
+        return parses
+
+    def test_syntax_error_score_is_cached(self, core, parses):
+        """Unparseable code scores 0.0 and is not parsed again"""
+        generator = core.CodeGenerator()
+        assert generator._analyze_python('def (:') == 0.0
+        assert generator._analyze_python('def (:') == 0.0
+        assert parses == ['def (:']
+
+    def test_oldest_entry_is_evicted(self, core, parses):
+        """Past _MAX_CACHE_ENTRIES the least recently used snippet is dropped"""
+        generator = core.CodeGenerator()
+        snippets = [f'x = {i}' for i in range(core._MAX_CACHE_ENTRIES + 1)]
+        for snippet in snippets:
+            generator._analyze_python(snippet)
+        assert len(generator.code_cache) == core._MAX_CACHE_ENTRIES
+        assert snippets[0] not in generator.code_cache
+        generator._analyze_python(snippets[0])
+        assert parses[-1] == snippets[0]
+        assert len(parses) == len(snippets) + 1
+
+
+class TestPythonFormatting:
+    """Test cases for the Python formatter fallback chain"""
+
+    @pytest.fixture
+    def calls(self):
+        return []
+
+    @pytest.fixture
+    def missing(self, calls):
+        def missing(code):
+            calls.append('missing')
+            raise ImportError('No module named missing')
+        return missing
+
+    def test_unimportable_backend_is_dropped(self, core, calls, missing, monkeypatch):
+        """The next backend is used and the missing one is not retried"""
+        def working(code):
+            calls.append('working')
+            return code.replace('=', ' = ')
+        monkeypatch.setattr(core, '_PYTHON_FORMATTERS', [missing, working])
+        generator = core.CodeGenerator()
+        assert generator._format_python('x=1') == 'x = 1'
+        assert core._PYTHON_FORMATTERS == [working]
+        assert generator._format_python('y=2') == 'y = 2'
+        assert calls == ['missing', 'working', 'working']
+
+    def test_code_is_unchanged_when_every_backend_fails(self, core, missing, monkeypatch):
+        """Formatting failures fall back to the original source"""
+        def broken(code):
+            raise ValueError('cannot parse')
+        monkeypatch.setattr(core, '_PYTHON_FORMATTERS', [missing, broken])
+        assert core.CodeGenerator()._format_python('x=1') == 'x=1'
+        assert core._PYTHON_FORMATTERS == [broken]